@@ -1,16 +1,33 @@
+import csv
+import itertools
 import streamlit as st
 import pandas as pd
-from io import BytesIO
+import numpy as np
+import openpyxl
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from io import BytesIO, StringIO
+
+try:
+    import python_calamine  # noqa: F401  (Rust-backed engine for pd.read_excel)
+    HAS_CALAMINE = True
+except ImportError:
+    HAS_CALAMINE = False
 
 from db import (
+    CANON_COLS,
+    STRING_DTYPE,
+    connection,
     get_engine,
     init_db,
+    get_or_create_dataset,
     get_or_create_dataset_id,
     list_datasets,
     load_dataset,
     replace_dataset_with_df,
     add_record,
     delete_records,
+    search_dataset,
 )
 
 # ----------------- Excel normalization + mapping (your working approach) -----------------
@@ -27,6 +44,9 @@ ALIASES = {
 }
 
 CANONICAL_ORDER = ["supplier", "product", "details", "website", "phone", "login_info"]
+# above this size, search runs in Postgres against the trigram index instead of in pandas
+SERVER_SEARCH_MIN_ROWS = 50_000
+
 DISPLAY_NAMES = {
     "supplier": "Supplier",
     "product": "Product",
@@ -35,6 +55,7 @@ DISPLAY_NAMES = {
     "phone": "Phone",
     "login_info": "Login Info",
 }
+DISPLAY_TO_CANON = {v: k for k, v in DISPLAY_NAMES.items()}
 
 def norm(s: str) -> str:
     return (
@@ -45,102 +66,197 @@ def norm(s: str) -> str:
         .replace("\t", " ")
     )
 
+def dedup_headers(headers: list) -> list:
+    # repeated names become "x.1", "x.2", ... (skipping names already in the sheet) the way
+    # pd.read_excel mangles them, so df_raw[col] is always a single column
+    taken = set(headers)
+    seen = set()
+    counts = {}
+    out = []
+    for h in headers:
+        name = h
+        if h in seen:
+            n = counts.get(h, 0) + 1
+            while f"{h}.{n}" in taken:
+                n += 1
+            counts[h] = n
+            name = f"{h}.{n}"
+            taken.add(name)
+        seen.add(h)
+        out.append(name)
+    return out
+
+def read_excel_rows(file) -> pd.DataFrame:
+    if HAS_CALAMINE:
+        return pd.read_excel(file, engine="calamine").dropna(how="all").reset_index(drop=True)
+
+    # fallback: read_only streams rows instead of building the full workbook DOM;
+    # data_only returns cached formula results rather than formula strings
+    wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        headers = next(rows, None)
+        if headers is None:
+            return pd.DataFrame()
+        headers = [h if h is not None else f"Unnamed: {i}" for i, h in enumerate(headers)]
+        df = pd.DataFrame.from_records(rows, columns=dedup_headers(headers))
+    finally:
+        wb.close()
+    return df.dropna(how="all").reset_index(drop=True)
+
+# normalized alias -> (canonical, preference rank), built once at import
+REVERSE_ALIASES = {
+    norm(opt): (canonical, rank)
+    for canonical, options in ALIASES.items()
+    for rank, opt in enumerate(options)
+}
+
 def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
     df = df.copy()
-    df.columns = [norm(c) for c in df.columns]
+    # same steps as norm(), applied to the whole Index at once
+    df.columns = df.columns.astype(str).str.strip().str.lower().str.replace(r"[\n\t]", " ", regex=True)
     return df
 
 def infer_mapping(columns: list[str]) -> dict:
-    colset = set(columns)
-    mapping = {}
-    for canonical, options in ALIASES.items():
-        hit = None
-        for opt in options:
-            optn = norm(opt)
-            if optn in colset:
-                hit = optn
-                break
-        mapping[canonical] = hit
+    mapping = {canonical: None for canonical in ALIASES}
+    best_rank = {}
+    for c in columns:
+        hit = REVERSE_ALIASES.get(c)
+        if hit is None:
+            continue
+        canonical, rank = hit
+        # earlier aliases win, regardless of column order in the sheet
+        if rank < best_rank.get(canonical, len(ALIASES[canonical])):
+            best_rank[canonical] = rank
+            mapping[canonical] = c
     return mapping
 
 def build_details_from_remaining_columns(df_raw: pd.DataFrame, used_cols: set[str]) -> pd.Series:
     remaining = [c for c in df_raw.columns if c not in used_cols]
+    out = np.full(len(df_raw), "", dtype=object)
     if not remaining:
-        return pd.Series([""] * len(df_raw), index=df_raw.index)
-
-    tmp = df_raw[remaining].copy()
+        return pd.Series(out, index=df_raw.index)
 
-    # convert to string safely
-    tmp = tmp.where(~tmp.isna(), "")
-    tmp = tmp.astype(str).apply(lambda col: col.str.strip())
-
-    # remove "nan" literals
-    tmp = tmp.replace({"nan": "", "NaN": ""})
-
-    # prefix each column value with "col: " only when non-empty
     for c in remaining:
-        tmp[c] = tmp[c].where(tmp[c] == "", c + ": " + tmp[c])
+        # stringify + strip once per column; NA and "nan" literals count as empty
+        s = df_raw[c].astype(str).str.strip()
+        valid = (df_raw[c].notna() & s.ne("") & s.str.lower().ne("nan")).to_numpy()
+        piece = np.where(valid, (c + ": " + s).to_numpy(dtype=object), "")
 
-    # join non-empty parts per row
-    return tmp.agg(lambda row: " | ".join([v for v in row if v]), axis=1)
+        # append with " | " only between non-empty parts
+        out = np.where(out == "", piece, np.where(piece == "", out, out + " | " + piece))
+
+    return pd.Series(out, index=df_raw.index)
 
 def build_standard_df(df_raw: pd.DataFrame, mapping: dict) -> pd.DataFrame:
-    df = df_raw.copy()
     used_cols = set(v for v in mapping.values() if v)
 
+    def clean(col: str | None) -> pd.Series:
+        if not col:
+            return pd.Series("", index=df_raw.index, dtype=STRING_DTYPE)
+        return df_raw[col].astype(STRING_DTYPE).fillna("").str.strip()
+
     out = {}
-    out["Supplier"] = df[mapping["supplier"]]
-    out["Product"] = df[mapping["product"]]
+    out["Supplier"] = clean(mapping["supplier"])
+    out["Product"] = clean(mapping["product"])
 
-    out["Website"] = df[mapping["website"]] if mapping.get("website") else ""
-    out["Phone"] = df[mapping["phone"]] if mapping.get("phone") else ""
-    out["Login Info"] = df[mapping["login_info"]] if mapping.get("login_info") else ""
+    out["Website"] = clean(mapping.get("website"))
+    out["Phone"] = clean(mapping.get("phone"))
+    out["Login Info"] = clean(mapping.get("login_info"))
 
     if mapping.get("details"):
-        out["Details"] = df[mapping["details"]]
+        out["Details"] = clean(mapping["details"])
     else:
-        out["Details"] = build_details_from_remaining_columns(df, used_cols)
+        out["Details"] = build_details_from_remaining_columns(df_raw, used_cols).astype(STRING_DTYPE)
 
     std = pd.DataFrame(out)
-
-    for c in std.columns:
-        std[c] = std[c].where(~pd.isna(std[c]), "")
-        std[c] = std[c].astype(str).str.strip()
-
     std = std[(std["Supplier"] != "") & (std["Product"] != "")]
     return std.reset_index(drop=True)
 
 def to_canonical(df_std: pd.DataFrame) -> pd.DataFrame:
-    df = pd.DataFrame(
-        {
-            "supplier": df_std["Supplier"].astype(str),
-            "product": df_std["Product"].astype(str),
-            "details": df_std.get("Details", "").astype(str),
-            "website": df_std.get("Website", "").astype(str),
-            "phone": df_std.get("Phone", "").astype(str),
-            "login_info": df_std.get("Login Info", "").astype(str),
-        }
-    ).fillna("").astype(str)
+    df = df_std.rename(columns=DISPLAY_TO_CANON).reindex(columns=CANON_COLS, fill_value="")
+    df = df.astype(STRING_DTYPE).fillna("")
 
     df["supplier"] = df["supplier"].str.strip()
     df["product"] = df["product"].str.strip()
-    df = df[(df["supplier"] != "") & (df["product"] != "")]
-    return df.reset_index(drop=True)
+    return df[(df["supplier"] != "") & (df["product"] != "")].reset_index(drop=True)
 
 def to_excel_bytes(df: pd.DataFrame, sheet_name: str = "Master_List") -> bytes:
+    # write_only streams rows to the zip instead of keeping every Cell in memory
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    ws.append([str(c) for c in df.columns])
+    values = df.astype(object).where(df.notna(), None)
+    for row in values.itertuples(index=False, name=None):
+        ws.append(row)
     output = BytesIO()
-    with pd.ExcelWriter(output, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False, sheet_name=sheet_name)
+    wb.save(output)
+    return output.getvalue()
+
+def to_csv_bytes(df: pd.DataFrame) -> bytes:
+    # Arrow serializes straight to UTF-8 bytes from its column buffers. It quotes every
+    # header name regardless of quoting_style, so the header is written here, quoted only if needed
+    header = StringIO()
+    csv.writer(header, lineterminator="\n").writerow([str(c) for c in df.columns])
+    output = BytesIO(header.getvalue().encode("utf-8"))
+    output.seek(0, 2)
+    pa_csv.write_csv(
+        pa.Table.from_pandas(df, preserve_index=False),
+        output,
+        write_options=pa_csv.WriteOptions(include_header=False, quoting_style="needed"),
+    )
     return output.getvalue()
 
-def apply_search(df: pd.DataFrame, term: str) -> pd.DataFrame:
+def search_haystack(df: pd.DataFrame) -> pd.Series:
+    # one lowercased string per row; "\x1f" between fields keeps a match from spanning two of them
+    hay = df[CANON_COLS[0]].fillna("")
+    for c in CANON_COLS[1:]:
+        hay = hay + "\x1f" + df[c].fillna("")
+    return hay.str.lower()
+
+def apply_search(df: pd.DataFrame, term: str, haystack: pd.Series | None = None) -> pd.DataFrame:
     term = (term or "").strip().lower()
     if not term:
         return df
-    mask = False
-    for c in ["supplier", "product", "details", "website", "phone", "login_info"]:
-        mask = mask | df[c].astype(str).str.lower().str.contains(term, na=False)
-    return df[mask]
+    if haystack is None:
+        haystack = search_haystack(df)
+    # a single plain substring scan (regex=False) over one Arrow buffer
+    return df[haystack.str.contains(term, na=False, regex=False).to_numpy(dtype=bool)]
+
+# ----------------- Cached reads -----------------
+# Streamlit reruns the script on every interaction; reads are cached and keyed on a
+# version that each mutation bumps. st.cache_data is shared by every session in the process,
+# so the versions must be too: they live in a cache_resource and come from one process-wide
+# counter, so a key never names two different snapshots. ttl bounds staleness from other processes.
+DATASETS_KEY = "__datasets__"
+
+@st.cache_resource
+def shared_versions() -> tuple[dict, itertools.count]:
+    return {}, itertools.count(1)
+
+def data_version(key) -> int:
+    return shared_versions()[0].get(key, 0)
+
+def bump_version(key) -> None:
+    versions, counter = shared_versions()
+    versions[key] = next(counter)
+
+def canonicalize(df_db: pd.DataFrame) -> pd.DataFrame:
+    missing = [c for c in CANON_COLS if c not in df_db.columns]
+    if missing:
+        df_db = df_db.assign(**{c: "" for c in missing})
+    return df_db.astype({c: STRING_DTYPE for c in CANON_COLS}).fillna({c: "" for c in CANON_COLS})
+
+# canonicalized inside the cache, so reruns skip the copy/fill/cast pass; the search haystack
+# is cached with the frame it was built from (None when search runs server-side) so the two never drift
+@st.cache_data(ttl=60, show_spinner=False)
+def load_dataset_cached(_engine, dataset_id: int, version: int) -> tuple[pd.DataFrame, pd.Series | None]:
+    df = canonicalize(load_dataset(_engine, dataset_id))
+    return df, (search_haystack(df) if len(df) < SERVER_SEARCH_MIN_ROWS else None)
+
+@st.cache_data(ttl=60, show_spinner=False)
+def list_datasets_cached(_bind, version: int) -> pd.DataFrame:
+    return list_datasets(_bind)
 
 # ----------------- App -----------------
 st.set_page_config(page_title="Sourcing Manager Pro", layout="wide")
@@ -150,18 +266,23 @@ engine = get_engine(st.secrets["DATABASE_URL"])
 init_db(engine)
 
 default_name = st.secrets.get("DEFAULT_DATASET_NAME", "Main")
-default_id = get_or_create_dataset_id(engine, default_name)
+# one pool checkout for the startup reads
+with connection(engine) as conn:
+    default_id, created = get_or_create_dataset(conn, default_name)
+    if created:
+        bump_version(DATASETS_KEY)
+    datasets_df = list_datasets_cached(conn, data_version(DATASETS_KEY))
 
 # Sidebar: choose server file (dataset)
 st.sidebar.header("Server files")
-datasets_df = list_datasets(engine)
-name_by_id = dict(zip(datasets_df["id"], datasets_df["name"]))
+dataset_ids = datasets_df["id"].tolist()
+name_by_id = dict(zip(dataset_ids, datasets_df["name"]))
 
 selected_id = st.sidebar.selectbox(
     "Open server file",
-    options=list(datasets_df["id"]),
+    options=dataset_ids,
     format_func=lambda i: name_by_id.get(i, f"Dataset {i}"),
-    index=(list(datasets_df["id"]).index(default_id) if default_id in list(datasets_df["id"]) else 0),
+    index=(dataset_ids.index(default_id) if default_id in name_by_id else 0),
 )
 
 st.sidebar.divider()
@@ -172,23 +293,25 @@ if st.sidebar.button("Create"):
         st.sidebar.error("Enter a name.")
     else:
         get_or_create_dataset_id(engine, new_ds_name.strip())
+        bump_version(DATASETS_KEY)
         st.sidebar.success("Created.")
         st.rerun()
 
 tab1, tab2, tab3, tab4 = st.tabs(["🔍 Search", "➕ Add / 🗑️ Delete", "📂 Import Excel", "💾 Export"])
 
 # Load current dataset
-df_db = load_dataset(engine, selected_id)
-df_can = df_db.copy()
-for c in ["supplier", "product", "details", "website", "phone", "login_info"]:
-    if c not in df_can.columns:
-        df_can[c] = ""
-df_can = df_can.fillna("").astype(str)
+df_can, haystack = load_dataset_cached(engine, selected_id, data_version(selected_id))
 
 with tab1:
     st.caption(f"Open server file: {name_by_id.get(selected_id, str(selected_id))} | Rows: {len(df_can)}")
     term = st.text_input("Search products, suppliers, or keywords:")
-    filtered = apply_search(df_can, term)
+    if term.strip() and haystack is None:
+        # same NULL -> "" pass as the cached load, so both search paths render alike
+        filtered = canonicalize(search_dataset(engine, selected_id, term.strip()))
+    elif term.strip():
+        filtered = apply_search(df_can, term, haystack)
+    else:
+        filtered = df_can
 
     show = filtered.rename(
         columns={
@@ -229,15 +352,16 @@ with tab2:
                     phone=(phone or "").strip(),
                     login_info=(login_info or "").strip(),
                 )
+                bump_version(selected_id)
                 st.success("Saved.")
                 st.rerun()
 
     st.divider()
     st.subheader("Delete record(s) (saved server-side)")
-    if df_db.empty:
+    if df_can.empty:
         st.info("No records to delete.")
     else:
-        ids = df_db["id"].tolist()
+        ids = df_can["id"].tolist()
         to_delete = st.multiselect("Select Record IDs to delete", options=ids)
         confirm_del = st.checkbox("I understand this permanently deletes the selected records.")
         if st.button("Delete selected"):
@@ -246,7 +370,8 @@ with tab2:
             elif not confirm_del:
                 st.error("Tick the confirmation checkbox first.")
             else:
-                n = delete_records(engine, selected_id, [int(x) for x in to_delete])
+                n = delete_records(engine, selected_id, to_delete)
+                bump_version(selected_id)
                 st.success(f"Deleted {n} record(s).")
                 st.rerun()
 
@@ -256,20 +381,22 @@ with tab3:
 
     uploaded = st.file_uploader("Upload Excel (.xlsx)", type=["xlsx"])
     if uploaded:
-        df_raw = pd.read_excel(uploaded)
+        df_raw = read_excel_rows(uploaded)
         df_raw = normalize_columns(df_raw)
 
         st.write("Detected columns:")
         st.code(", ".join(df_raw.columns))
 
-        auto_map = infer_mapping(list(df_raw.columns))
+        raw_columns = list(df_raw.columns)
+        auto_map = infer_mapping(raw_columns)
         mapping = {}
-        options = ["(not mapped)"] + list(df_raw.columns)
+        options = ["(not mapped)"] + raw_columns
+        option_idx = {opt: i for i, opt in enumerate(options)}
 
         st.write("Column mapping (auto-detected; you can override):")
         for canonical in CANONICAL_ORDER:
             default = auto_map.get(canonical)
-            default_idx = options.index(default) if default in options else 0
+            default_idx = option_idx.get(default, 0)
             choice = st.selectbox(
                 f"{DISPLAY_NAMES[canonical]} ←",
                 options,
@@ -303,6 +430,7 @@ with tab3:
                         st.error("Tick the confirmation checkbox first.")
                     else:
                         replace_dataset_with_df(engine, selected_id, df_new)
+                        bump_version(selected_id)
                         st.success("Overwritten.")
                         st.rerun()
             else:
@@ -311,8 +439,10 @@ with tab3:
                     if not new_name.strip():
                         st.error("Enter a name.")
                     else:
-                        new_id = get_or_create_dataset_id(engine, new_name.strip())
-                        replace_dataset_with_df(engine, new_id, df_new)
+                        new_id, created = get_or_create_dataset(engine, new_name.strip())
+                        replace_dataset_with_df(engine, new_id, df_new, new_dataset=created)
+                        bump_version(new_id)
+                        bump_version(DATASETS_KEY)
                         st.success("Created new server file.")
                         st.rerun()
 
@@ -338,7 +468,7 @@ with tab4:
     )
     st.download_button(
         "📥 Download as CSV",
-        data=export_df.to_csv(index=False).encode("utf-8"),
+        data=to_csv_bytes(export_df),
         file_name=f"{filename_base}.csv",
         mime="text/csv",
     )
@@ -1,19 +1,78 @@
 from __future__ import annotations
-import io
-import csv
+import struct
+from contextlib import contextmanager
+import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine, text
-from sqlalchemy.engine import Engine
+import pyarrow as pa
+import pyarrow.compute as pc
+from sqlalchemy import create_engine, make_url, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError, OperationalError
 
 CANON_COLS = ["supplier", "product", "details", "website", "phone", "login_info"]
+# Arrow-backed strings: contiguous buffers, C kernels for .str ops
+STRING_DTYPE = "string[pyarrow]"
+# records.id is a SERIAL (int4)
+RECORD_ID_DTYPE = {"id": "int32[pyarrow]"}
+# all searchable fields in one expression (chr(31) keeps matches from spanning fields);
+# must match idx_records_search exactly for the trigram index to be used
+SEARCH_EXPR = " || chr(31) || ".join(f"coalesce({c}, '')" for c in CANON_COLS)
+
+# COPY ... (FORMAT BINARY) framing: signature, flags, header extension length / end-of-data marker
+PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\0" + struct.pack(">ii", 0, 0)
+PGCOPY_TRAILER = struct.pack(">h", -1)
+# rows framed per chunk while streaming COPY
+COPY_CHUNK_ROWS = 50_000
+# rows per fetch when streaming a dataset out of Postgres
+LOAD_CHUNK_ROWS = 50_000
+# above this, replace_dataset_with_df loads into an unindexed table and builds indexes once
+INDEX_BUILD_MIN_ROWS = 50_000
+# ids bound per DELETE in delete_records
+DELETE_CHUNK_IDS = 10_000
+
+# pg_advisory_xact_lock keys serializing init_db / partition swaps across sessions
+INIT_LOCK_KEY = 0x494E5654  # "INVT"
+SWAP_LOCK_KEY = 0x494E5653  # "INVS"
+# how long a swap may queue for the ACCESS EXCLUSIVE lock on records (readers queue behind it),
+# and how many times it retries before falling back to a copy under the partition's own lock
+SWAP_LOCK_TIMEOUT = "2s"
+SWAP_LOCK_ATTEMPTS = 5
+
+# list_datasets result, keyed on a (count, max(created_at)) version token
+_datasets_cache: dict[tuple, pd.DataFrame] = {}
 
 
 def get_engine(database_url: str) -> Engine:
-    return create_engine(database_url, pool_pre_ping=True)
+    # the COPY/prepare code below talks to psycopg (3) directly, so pin that driver
+    # whatever the URL asks for (plain postgresql:// defaults differ across SQLAlchemy versions)
+    url = make_url(database_url).set(drivername="postgresql+psycopg")
+    # sized for concurrent Streamlit sessions; recycle before server-side idle timeouts
+    return create_engine(url, pool_pre_ping=True, pool_size=20, max_overflow=20, pool_recycle=1800)
+
+
+@contextmanager
+def connection(engine: Engine):
+    """One pooled checkout, committed on exit, for callers chaining several helpers."""
+    with engine.begin() as conn:
+        yield conn
+
+
+@contextmanager
+def _begin(bind: Engine | Connection):
+    # an active Connection belongs to the caller, who also owns its transaction
+    if isinstance(bind, Connection):
+        yield bind
+    else:
+        with bind.begin() as conn:
+            yield conn
 
 
 def init_db(engine: Engine) -> None:
     with engine.begin() as conn:
+        # runs on every rerun of every session: without this, two sessions starting together can
+        # both see the legacy table below and the second renames the new partitioned one.
+        # An advisory lock (not LOCK TABLE) since records may not exist yet; released at commit
+        conn.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": INIT_LOCK_KEY})
         conn.execute(
             text(
                 """
@@ -25,92 +84,377 @@ def init_db(engine: Engine) -> None:
                 """
             )
         )
+
+        # migration: an unpartitioned records table from before LIST partitioning is moved
+        # aside here and its rows copied into the partitioned table below
+        kind = conn.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass('records')")).scalar()
+        legacy = kind == "r"
+        if legacy:
+            conn.execute(text("DROP INDEX IF EXISTS idx_records_dataset, idx_records_dataset_id, idx_records_search;"))
+            conn.execute(text("ALTER TABLE records RENAME TO records_legacy;"))
+
+        # one partition per dataset, so replacing a dataset is a TRUNCATE of its partition;
+        # the (dataset_id, id) key serves load_dataset's filter and ORDER BY without a sort
         conn.execute(
             text(
                 """
                 CREATE TABLE IF NOT EXISTS records (
-                    id SERIAL PRIMARY KEY,
+                    id SERIAL,
                     dataset_id INTEGER NOT NULL REFERENCES datasets(id) ON DELETE CASCADE,
                     supplier TEXT NOT NULL,
                     product TEXT NOT NULL,
                     details TEXT,
                     website TEXT,
                     phone TEXT,
-                    login_info TEXT
-                );
+                    login_info TEXT,
+                    PRIMARY KEY (dataset_id, id)
+                ) PARTITION BY LIST (dataset_id);
                 """
             )
         )
-        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_records_dataset ON records(dataset_id);"))
+        # the trigram index only speeds up search_dataset's ILIKE, so it is skipped where pg_trgm
+        # isn't installed or this role may not create extensions
+        has_trgm = conn.execute(text("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")).scalar()
+        if not has_trgm and conn.execute(
+            text("SELECT EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm')")
+        ).scalar():
+            try:
+                with conn.begin_nested():
+                    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm;"))
+                has_trgm = True
+            except DBAPIError:
+                pass
+        if has_trgm:
+            conn.execute(
+                text(
+                    f"CREATE INDEX IF NOT EXISTS idx_records_search ON records "
+                    f"USING gin (({SEARCH_EXPR}) gin_trgm_ops);"
+                )
+            )
 
+        missing = conn.execute(
+            text("SELECT id FROM datasets WHERE to_regclass('records_p' || id) IS NULL")
+        ).scalars()
+        for dataset_id in missing:
+            create_partition(conn, dataset_id)
 
-def get_or_create_dataset_id(engine: Engine, name: str) -> int:
-    with engine.begin() as conn:
-        row = conn.execute(text("SELECT id FROM datasets WHERE name=:n"), {"n": name}).fetchone()
-        if row:
-            return int(row[0])
-        row = conn.execute(
-            text("INSERT INTO datasets(name) VALUES (:n) RETURNING id"),
-            {"n": name},
-        ).fetchone()
-        return int(row[0])
+        if legacy:
+            # ids handed out by the legacy sequence stay used even if their rows were deleted
+            # (users see and pick Record IDs), so read its position before DROP takes it along
+            used = 0
+            legacy_seq = conn.execute(text("SELECT pg_get_serial_sequence('records_legacy', 'id')")).scalar()
+            if legacy_seq:
+                last_value, is_called = conn.execute(text(f"SELECT last_value, is_called FROM {legacy_seq}")).one()
+                used = last_value if is_called else last_value - 1
+            conn.execute(
+                text(
+                    """
+                    INSERT INTO records (id, dataset_id, supplier, product, details, website, phone, login_info)
+                    SELECT id, dataset_id, supplier, product, details, website, phone, login_info FROM records_legacy;
+                    """
+                )
+            )
+            conn.execute(
+                text(
+                    "SELECT setval(pg_get_serial_sequence('records', 'id'), "
+                    "GREATEST(COALESCE(MAX(id), 0), :used) + 1, false) FROM records"
+                ),
+                {"used": used},
+            )
+            conn.execute(text("DROP TABLE records_legacy;"))
+
+
+def partition_name(dataset_id: int) -> str:
+    return f"records_p{int(dataset_id)}"
 
 
-def list_datasets(engine: Engine) -> pd.DataFrame:
-    return pd.read_sql("SELECT id, name, created_at FROM datasets ORDER BY name", engine)
+def create_partition(conn: Connection, dataset_id: int) -> None:
+    did = int(dataset_id)
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {partition_name(did)} PARTITION OF records FOR VALUES IN ({did})"))
 
 
-def load_dataset(engine: Engine, dataset_id: int) -> pd.DataFrame:
-    return pd.read_sql(
+def get_or_create_dataset(bind: Engine | Connection, name: str) -> tuple[int, bool]:
+    """Return (id, created) for the dataset called name, creating it if needed."""
+    with _begin(bind) as conn:
+        # this runs on every rerun, so the hit path is a plain read: even INSERT ... DO NOTHING
+        # draws a sequence value before it sees the conflict, burning a dataset id each time
+        found = conn.execute(text("SELECT id FROM datasets WHERE name = :n"), {"n": name}).scalar()
+        if found is not None:
+            return int(found), False
+
+        # miss: DO NOTHING yields no row if the name appeared meanwhile, so the existing id
+        # comes from the SELECT branch
+        row = None
+        while row is None:
+            # None only if a concurrent insert of the same name committed after this statement's
+            # snapshot; the retry's fresh snapshot sees it
+            row = conn.execute(
+                text(
+                    """
+                    WITH ins AS (
+                        INSERT INTO datasets(name) VALUES (:n) ON CONFLICT (name) DO NOTHING RETURNING id
+                    )
+                    SELECT id, true AS inserted FROM ins
+                    UNION ALL
+                    SELECT id, false AS inserted FROM datasets WHERE name = :n
+                    """
+                ),
+                {"n": name},
+            ).fetchone()
+        if row.inserted:
+            create_partition(conn, row.id)
+            _datasets_cache.clear()
+        return int(row.id), bool(row.inserted)
+
+
+def get_or_create_dataset_id(bind: Engine | Connection, name: str) -> int:
+    return get_or_create_dataset(bind, name)[0]
+
+
+def list_datasets(bind: Engine | Connection) -> pd.DataFrame:
+    # the full listing is only re-read when the cheap (count, newest) token changes
+    with _begin(bind) as conn:
+        version = tuple(conn.execute(text("SELECT count(*), max(created_at) FROM datasets")).one())
+        df = _datasets_cache.get(version)
+        if df is None:
+            # small metadata result: build the frame straight from the driver rows
+            rows = conn.exec_driver_sql("SELECT id, name, created_at FROM datasets ORDER BY name").fetchall()
+            df = pd.DataFrame.from_records(rows, columns=["id", "name", "created_at"])
+            _datasets_cache.clear()
+            _datasets_cache[version] = df
+        return df.copy()
+
+
+def load_dataset_chunks(bind: Engine | Connection, dataset_id: int, chunksize: int = LOAD_CHUNK_ROWS):
+    # stream_results makes psycopg use a server-side (named) cursor, so rows arrive
+    # chunksize at a time instead of being fetched into one Python list up front
+    with _begin(bind) as conn:
+        for chunk in pd.read_sql(
+            text(
+                """
+                SELECT id, supplier, product, details, website, phone, login_info
+                FROM records
+                WHERE dataset_id = :did
+                ORDER BY id
+                """
+            ).execution_options(stream_results=True),
+            conn,
+            params={"did": dataset_id},
+            chunksize=chunksize,
+            dtype_backend="pyarrow",
+            dtype=RECORD_ID_DTYPE,
+        ):
+            yield chunk.astype({c: STRING_DTYPE for c in CANON_COLS if c in chunk.columns})
+
+
+def load_dataset(bind: Engine | Connection, dataset_id: int) -> pd.DataFrame:
+    return pd.concat(load_dataset_chunks(bind, dataset_id), ignore_index=True)
+
+
+def search_dataset(engine: Engine, dataset_id: int, term: str) -> pd.DataFrame:
+    # escape LIKE wildcards so the term is matched literally
+    pattern = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    df = pd.read_sql(
         text(
-            """
+            f"""
             SELECT id, supplier, product, details, website, phone, login_info
             FROM records
-            WHERE dataset_id = :did
+            WHERE dataset_id = :did AND ({SEARCH_EXPR}) ILIKE :p
             ORDER BY id
             """
         ),
         engine,
-        params={"did": dataset_id},
+        params={"did": dataset_id, "p": f"%{pattern}%"},
+        dtype_backend="pyarrow",
+        dtype=RECORD_ID_DTYPE,
     )
+    return df.astype({c: STRING_DTYPE for c in CANON_COLS if c in df.columns})
+
 
+def binary_copy_chunks(df: pd.DataFrame, dataset_id: int):
+    # binary COPY skips Postgres' CSV parsing/unescaping; every field is length-prefixed.
+    # Rows are framed column-wise with Arrow kernels, COPY_CHUNK_ROWS at a time.
+    yield PGCOPY_HEADER
+    # field count, then dataset_id as a 4-byte int4
+    row_head = pa.scalar(struct.pack(">hii", 1 + len(CANON_COLS), 4, dataset_id), pa.large_binary())
+    # Arrow strings are already UTF-8, so the cast to binary needs no re-encoding
+    cols = [pa.array(df[c], type=pa.large_string()).cast(pa.large_binary()) for c in CANON_COLS]
+    for i in range(0, len(df), COPY_CHUNK_ROWS):
+        parts = [row_head]
+        for col in cols:
+            data = col.slice(i, COPY_CHUNK_ROWS)
+            lens = pc.binary_length(data).to_numpy().astype(">i4")
+            prefix = pa.Array.from_buffers(pa.binary(4), len(data), [None, pa.py_buffer(lens.tobytes())])
+            parts += [prefix.cast(pa.large_binary()), data]
+        rows = pc.binary_join_element_wise(*parts, pa.scalar(b"", pa.large_binary()))
+        # the joined rows sit back to back in the values buffer
+        offsets = np.frombuffer(rows.buffers()[1], dtype=np.int64)
+        yield memoryview(rows.buffers()[2])[offsets[rows.offset]:offsets[rows.offset + len(rows)]]
+    yield PGCOPY_TRAILER
 
-def replace_dataset_with_df(engine, dataset_id: int, df: pd.DataFrame) -> None:
-    df = df.copy()
-    for c in ["supplier","product","details","website","phone","login_info"]:
-        if c not in df.columns:
-            df[c] = ""
-    df = df[["supplier","product","details","website","phone","login_info"]].fillna("").astype(str)
+
+def replace_dataset_with_df(engine, dataset_id: int, df: pd.DataFrame, new_dataset: bool = False) -> None:
+    # normalize only the canonical columns, in Arrow compute kernels; the caller's frame
+    # is never copied wholesale
+    n = len(df)
+    cols = {}
+    for c in CANON_COLS:
+        if c in df.columns:
+            s = df[c]
+            # string-typed columns (the usual case from the import path) go to Arrow as-is;
+            # only mixed/numeric columns pay for a cast
+            if not pd.api.types.is_string_dtype(s):
+                s = s.astype(STRING_DTYPE)
+            cols[c] = pa.array(s).cast(pa.large_string()).fill_null("")
+        else:
+            cols[c] = pa.repeat(pa.scalar("", pa.large_string()), n)
+    cols["supplier"] = pc.utf8_trim_whitespace(cols["supplier"])
+    cols["product"] = pc.utf8_trim_whitespace(cols["product"])
 
     # drop empty required rows
-    df["supplier"] = df["supplier"].str.strip()
-    df["product"] = df["product"].str.strip()
-    df = df[(df["supplier"] != "") & (df["product"] != "")]
+    keep = pc.and_(pc.greater(pc.utf8_length(cols["supplier"]), 0), pc.greater(pc.utf8_length(cols["product"]), 0))
+    df = pa.table(cols).filter(keep).to_pandas(types_mapper=pd.ArrowDtype)
 
     with engine.begin() as conn:
-        conn.execute(text("DELETE FROM records WHERE dataset_id=:did"), {"did": dataset_id})
+        # don't wait on the WAL flush at commit: a crash can lose at most this just-committed
+        # bulk load, which is reloadable from its source file; LOCAL reverts at commit
+        conn.execute(text("SET LOCAL synchronous_commit = off"))
 
+        # TRUNCATE of the dataset's own partition is a metadata operation, independent of row count
+        partition = partition_name(dataset_id)
         if df.empty:
+            conn.execute(text(f"TRUNCATE {partition}"))
             return
 
-        # Use raw psycopg2 connection for COPY
-        raw = conn.connection.connection  # SQLAlchemy -> DBAPI -> psycopg2 connection
-        cur = raw.cursor()
+        if len(df) > INDEX_BUILD_MIN_ROWS:
+            swap_in_partition(conn, dataset_id, df)
+            return
 
-        buf = io.StringIO()
-        writer = csv.writer(buf)
-        for row in df.itertuples(index=False, name=None):
-            writer.writerow((dataset_id, *row))
-        buf.seek(0)
+        if new_dataset:
+            # nobody reads a just-created dataset yet, so skip the stage and COPY straight
+            # into the partition; truncating it in this transaction is what permits FREEZE
+            conn.execute(text(f"TRUNCATE {partition}"))
+            copy_rows(conn, partition, df, dataset_id, freeze=True)
+            return
+
+        # COPY into an unlogged, session-local stage first so the partition is only locked
+        # for the final TRUNCATE + INSERT ... SELECT, not while rows stream in
+        conn.execute(
+            text(
+                """
+                CREATE TEMP TABLE records_stage ON COMMIT DROP AS
+                SELECT dataset_id, supplier, product, details, website, phone, login_info
+                FROM records WITH NO DATA
+                """
+            )
+        )
+        copy_rows(conn, "records_stage", df, dataset_id)
+
+        conn.execute(
+            text(
+                f"""
+                TRUNCATE {partition};
+                INSERT INTO {partition} (dataset_id, supplier, product, details, website, phone, login_info)
+                SELECT dataset_id, supplier, product, details, website, phone, login_info FROM records_stage;
+                """
+            )
+        )
 
-        cur.copy_expert(
+
+def swap_in_partition(conn: Connection, dataset_id: int, df: pd.DataFrame) -> None:
+    # large loads go into a fresh, unindexed table; its indexes are then built once in bulk
+    # instead of growing row by row, and ATTACH adopts them as the partition's indexes
+    did = int(dataset_id)
+    partition = partition_name(did)
+    load = f"{partition}_load"
+    # LIKE holds a share lock on records until commit and the DROP below needs it exclusively, so
+    # two concurrent swaps would deadlock; one swap at a time (held until commit) avoids that
+    conn.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": SWAP_LOCK_KEY})
+    conn.execute(text(f"CREATE TABLE {load} (LIKE records INCLUDING DEFAULTS)"))
+    # created in this transaction, so rows can be written already frozen
+    copy_rows(conn, load, df, did, freeze=True)
+    # the CHECK lets ATTACH skip its partition-constraint scan
+    conn.execute(
+        text(
+            f"ALTER TABLE {load} ADD CONSTRAINT {load}_pkey PRIMARY KEY (dataset_id, id), "
+            f"ADD CHECK (dataset_id = {did})"
+        )
+    )
+    # mirror the parent's indexes only; init_db skips the trigram one without pg_trgm
+    has_search = conn.execute(text("SELECT to_regclass('idx_records_search') IS NOT NULL")).scalar()
+    if has_search:
+        conn.execute(text(f"CREATE INDEX {load}_search ON {load} USING gin (({SEARCH_EXPR}) gin_trgm_ops)"))
+    rename_search = f"ALTER INDEX {load}_search RENAME TO {partition}_search;" if has_search else ""
+    # DROP takes ACCESS EXCLUSIVE on records, and every reader queues behind a waiting request;
+    # a short lock_timeout bounds that wait and the savepoint lets the swap retry
+    conn.execute(text(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}'"))
+    for _ in range(SWAP_LOCK_ATTEMPTS):
+        try:
+            with conn.begin_nested():
+                # index names are settled after the old partition (and its indexes) is gone,
+                # so the next swap can reuse them
+                conn.execute(
+                    text(
+                        f"""
+                        DROP TABLE {partition};
+                        ALTER TABLE {load} RENAME TO {partition};
+                        ALTER INDEX {load}_pkey RENAME TO {partition}_pkey;
+                        {rename_search}
+                        ALTER TABLE records ATTACH PARTITION {partition} FOR VALUES IN ({did});
+                        """
+                    )
+                )
+            conn.execute(text("SET LOCAL lock_timeout = 0"))
+            return
+        except OperationalError as e:
+            # 55P03 lock_not_available
+            if getattr(e.orig, "sqlstate", None) != "55P03":
+                raise
+
+    # records stayed busy (e.g. a long reader): keep the loaded rows and move them in under the
+    # partition's own lock instead, as the staged path does; slower, but the load isn't thrown away
+    conn.execute(text("SET LOCAL lock_timeout = 0"))
+    conn.execute(
+        text(
+            f"""
+            TRUNCATE {partition};
+            INSERT INTO {partition} (id, dataset_id, supplier, product, details, website, phone, login_info)
+            SELECT id, dataset_id, supplier, product, details, website, phone, login_info FROM {load};
+            DROP TABLE {load};
             """
-            COPY records (dataset_id, supplier, product, details, website, phone, login_info)
-            FROM STDIN WITH (FORMAT CSV)
-            """,
-            buf,
         )
-        cur.close()
+    )
+
+
+def copy_rows(conn: Connection, table: str, df: pd.DataFrame, dataset_id: int, freeze: bool = False) -> None:
+    # COPY goes through the raw psycopg connection. FREEZE writes rows with frozen xmin, sparing
+    # a later VACUUM pass over them; Postgres only allows it when table was created or truncated
+    # in the current transaction
+    raw = conn.connection.driver_connection  # SQLAlchemy -> psycopg connection
+    with raw.cursor() as cur, cur.copy(
+        f"""
+        COPY {table} (dataset_id, supplier, product, details, website, phone, login_info)
+        FROM STDIN WITH (FORMAT BINARY{", FREEZE" if freeze else ""})
+        """
+    ) as copy:
+        # chunks are framed as they are written, so only one is held in memory
+        for chunk in binary_copy_chunks(df, dataset_id):
+            copy.write(chunk)
+
+
+def add_records(engine: Engine, dataset_id: int, rows: list[tuple]) -> None:
+    # rows are (supplier, product, details, website, phone, login_info) tuples;
+    # psycopg's executemany pipelines them instead of waiting one round-trip per row
+    if not rows:
+        return
+    with engine.begin() as conn:
+        raw = conn.connection.driver_connection
+        with raw.cursor() as cur:
+            cur.executemany(
+                "INSERT INTO records(dataset_id, supplier, product, details, website, phone, login_info) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                [(dataset_id, *r) for r in rows],
+            )
 
 
 def add_record(
@@ -123,24 +467,24 @@ def add_record(
     phone: str = "",
     login_info: str = "",
 ) -> None:
-    with engine.begin() as conn:
-        conn.execute(
-            text(
-                """
-                INSERT INTO records(dataset_id, supplier, product, details, website, phone, login_info)
-                VALUES (:did, :s, :p, :d, :w, :ph, :li)
-                """
-            ),
-            {"did": dataset_id, "s": supplier, "p": product, "d": details, "w": website, "ph": phone, "li": login_info},
-        )
+    add_records(engine, dataset_id, [(supplier, product, details, website, phone, login_info)])
 
 
 def delete_records(engine: Engine, dataset_id: int, record_ids: list[int]) -> int:
     if not record_ids:
         return 0
     with engine.begin() as conn:
-        res = conn.execute(
-            text("DELETE FROM records WHERE dataset_id=:did AND id = ANY(:ids)"),
-            {"did": dataset_id, "ids": record_ids},
-        )
-        return int(res.rowcount or 0)
+        # prepare=True has psycopg keep a server-side prepared statement per connection,
+        # so repeat deletes skip parse/plan; unnest lets Postgres plan a hash semi-join
+        raw = conn.connection.driver_connection
+        with raw.cursor() as cur:
+            # bounded array parameters keep server memory flat for very large selections
+            deleted = 0
+            for i in range(0, len(record_ids), DELETE_CHUNK_IDS):
+                cur.execute(
+                    "DELETE FROM records WHERE dataset_id = %s AND id IN (SELECT unnest(%s::int[]))",
+                    (dataset_id, list(record_ids[i : i + DELETE_CHUNK_IDS])),
+                    prepare=True,
+                )
+                deleted += cur.rowcount or 0
+            return deleted
@@ -0,0 +1,48 @@
+import struct
+
+import pandas as pd
+import pytest
+
+import db
+
+
+def reference_copy(df: pd.DataFrame, dataset_id: int) -> bytes:
+    # straightforward per-row PGCOPY encoder to check the Arrow framing against
+    out = [db.PGCOPY_HEADER]
+    for row in df[db.CANON_COLS].itertuples(index=False, name=None):
+        out.append(struct.pack(">hii", 1 + len(db.CANON_COLS), 4, dataset_id))
+        for value in row:
+            data = value.encode("utf-8")
+            out.append(struct.pack(">i", len(data)) + data)
+    out.append(db.PGCOPY_TRAILER)
+    return b"".join(out)
+
+
+def make_df(n: int) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "supplier": [f"Supplier {i}" for i in range(n)],
+            "product": ["Béta, \"x\"\n€" if i % 3 == 0 else "p" for i in range(n)],
+            "details": ["" if i % 2 else f"d{i}" for i in range(n)],
+            "website": "",
+            "phone": [str(i) * (i % 5) for i in range(n)],
+            "login_info": "\t\\",
+        },
+        dtype=db.STRING_DTYPE,
+    )
+
+
+@pytest.mark.parametrize("n", [0, 1, 7, 10, 25])
+def test_matches_reference_across_chunks(monkeypatch, n):
+    monkeypatch.setattr(db, "COPY_CHUNK_ROWS", 4)
+    df = make_df(n)
+    chunks = [bytes(c) for c in db.binary_copy_chunks(df, 42)]
+    # header, ceil(n / 4) row chunks, trailer
+    assert len(chunks) == 2 + -(-n // 4)
+    assert b"".join(chunks) == reference_copy(df, 42)
+
+
+def test_sliced_frame():
+    # a frame whose columns are slices of larger arrays must not leak rows from outside the slice
+    df = make_df(20).iloc[5:13].reset_index(drop=True)
+    assert b"".join(bytes(c) for c in db.binary_copy_chunks(df, 3)) == reference_copy(df, 3)